@@ -3,9 +3,11 @@ import pandas as pd
 from supabase import create_client, Client
 import os
 import hashlib
-import feedparser
-import feedparser
+import json
+import math
 import time
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
 # --- Configuration & Setup ---
@@ -19,6 +21,10 @@ st.set_page_config(
 # Authentication & Secrets
 def check_password():
     """Returns `True` if the user had the correct password."""
+    # Fast path for every rerun after login: no secrets lookup needed
+    if st.session_state.get("password_correct"):
+        return True
+
     # Secrets handling inside function to avoid init errors
     try:
         password = st.secrets["general"]["APP_PASSWORD"]
@@ -33,33 +39,25 @@ def check_password():
         else:
             st.session_state["password_correct"] = False
 
-    if "password_correct" not in st.session_state:
-        st.text_input("Password", type="password", on_change=password_entered, key="password")
-        return False
-    elif not st.session_state["password_correct"]:
-        st.text_input("Password", type="password", on_change=password_entered, key="password")
+    st.text_input("Password", type="password", on_change=password_entered, key="password")
+    if "password_correct" in st.session_state:
         st.error("😕 Password incorrect")
-        return False
-    else:
-        return True
+    return False
 
 if not check_password():
     st.stop()
 
 # Initialize Supabase
-try:
-    SUPABASE_URL = st.secrets["SUPABASE"]["URL"]
-    SUPABASE_KEY = st.secrets["SUPABASE"]["KEY"]
-except (KeyError, FileNotFoundError):
-    st.error("Missing [SUPABASE] URL or KEY in secrets manager.")
-    st.stop()
-
-# @st.cache_resource # Removed caching to allow secret updates without reboot
+# Cached across reruns/sessions; use "Reload Connection" in the sidebar after updating secrets
+@st.cache_resource
 def init_supabase() -> Client:
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    return create_client(st.secrets["SUPABASE"]["URL"], st.secrets["SUPABASE"]["KEY"])
 
 try:
     supabase = init_supabase()
+except (KeyError, FileNotFoundError):
+    st.error("Missing [SUPABASE] URL or KEY in secrets manager.")
+    st.stop()
 except Exception as e:
     st.error(f"Failed to initialize Supabase client: {e}")
     st.stop()
@@ -67,44 +65,151 @@ except Exception as e:
 
 # --- Helper Functions ---
 
-def safe_query(table_name, select="*", order=None, limit=None, filters=None):
-    """Safely execute a select query with error handling."""
+# All failure states of `item_status` (see supabase_schema.sql)
+FAILED_STATUSES = ['FAILED_CRAWL', 'FAILED_AI', 'FAILED_WP', 'FAILED_SANITY']
+# Items that may be (re)sent to the Dify workflow
+RUNNABLE_STATUSES = {'PENDING', *FAILED_STATUSES}
+
+QUEUE_PAGE_SIZE = 50
+ITEM_INSERT_BATCH = 500
+RSS_FETCH_WORKERS = 8
+
+# Columns rendered by the queue grid / console; full rows are fetched on demand
+QUEUE_COLUMNS = "id,source_id,status,created_at,title_original,source_published_at,original_url"
+
+def apply_filters(query, filters=None, in_filters=None):
+    """Apply `eq` / `in_` filters given as {column: value(s)} dicts."""
+    if filters:
+         for k, v in filters.items():
+             query = query.eq(k, v)
+    if in_filters:
+         for k, v in in_filters.items():
+             query = query.in_(k, v)
+    return query
+
+def run_query(table_name, select="*", order=None, limit=None, filters=None, in_filters=None, range_=None):
+    """Execute a select query and return the raw list of row dicts; errors are raised."""
+    query = supabase.table(table_name).select(select)
+    if order:
+        col, direction = order
+        query = query.order(col, desc=(direction == "desc"))
+    if limit:
+        query = query.limit(limit)
+    
+    # Apply filters if any
+    query = apply_filters(query, filters, in_filters)
+             
+    # Pagination: (start, end) row window, both inclusive
+    if range_:
+        query = query.range(*range_)
+    
+    response = query.execute()
+    return response.data or []
+
+def report_db_error(table_name, e):
+    # Check specifically for the missing table error
+    err_str = str(e)
+    if "Could not find the table" in err_str:
+        st.error(f"❌ Table `{table_name}` not found in Supabase! ignoring...")
+        st.warning("Please ensure you have run the `supabase_schema.sql` in Supabase SQL Editor.")
+    else:
+        st.error(f"Database Error ({table_name}): {e}")
+
+def safe_query_raw(table_name, **kwargs):
+    """Safely execute a select query with error handling; returns the raw list of row dicts."""
     try:
-        query = supabase.table(table_name).select(select)
-        if order:
-            col, direction = order
-            query = query.order(col, desc=(direction == "desc"))
-        if limit:
-            query = query.limit(limit)
-        
-        # Apply filters if any
-        if filters:
-             for k, v in filters.items():
-                 query = query.eq(k, v)
-                 
-        start = 0
-        end = limit if limit else 1000
-        # Basic pagination/limit logic for simple dash
-        # response = query.range(start, end).execute() # Range is safer for huge tables
-        
-        # For now, standard execute
-        response = query.execute()
-        return pd.DataFrame(response.data) if response.data else pd.DataFrame()
-        
+        return run_query(table_name, **kwargs)
     except Exception as e:
-        # Check specifically for the missing table error
-        err_str = str(e)
-        if "Could not find the table" in err_str:
-            st.error(f"❌ Table `{table_name}` not found in Supabase! ignoring...")
-            st.warning("Please ensure you have run the `supabase_schema.sql` in Supabase SQL Editor.")
-        else:
-            st.error(f"Database Error ({table_name}): {e}")
-        return pd.DataFrame()
+        report_db_error(table_name, e)
+        return []
+
+def load_cached(loader, table_name, **kwargs):
+    """Call a cached loader, reporting DB errors here so failures are never cached.
+
+    Returns None on error.
+    """
+    try:
+        return loader(**kwargs)
+    except Exception as e:
+        report_db_error(table_name, e)
+        return None
+
+def parse_timestamps(df, cols=("created_at",)):
+    """Convert Supabase ISO-8601 timestamp columns to datetimes (no format inference)."""
+    for col in cols:
+        if col in df:
+            df[col] = pd.to_datetime(df[col], format="ISO8601", utc=True, cache=True)
+    return df
+
+def count_where(table_name, filters=None, in_filters=None):
+    """Exact row count for the given filters (HEAD request, no row payload)."""
+    query = supabase.table(table_name).select("id", count="exact", head=True)
+    return apply_filters(query, filters, in_filters).execute().count or 0
+
+@st.cache_data(ttl=30, show_spinner=False)
+def get_dashboard_stats():
+    """Fetch dashboard KPI counts and latest activity in one round-trip via the `dashboard_stats` RPC."""
+    try:
+        return supabase.rpc("dashboard_stats").execute().data or {}
+    except Exception:
+        # RPC not deployed yet: fall back to HEAD-only counts (no row payload),
+        # issued in parallel so the wall time is one round-trip rather than four
+        counts = {
+            "pub": ("items", {"status": "PUBLISHED"}, None),
+            "fail": ("items", None, {"status": FAILED_STATUSES}),
+            "pending": ("items", {"status": "PENDING"}, None),
+            "active": ("sources", {"is_active": True}, None),
+        }
+        with ThreadPoolExecutor(max_workers=len(counts)) as executor:
+            futures = {key: executor.submit(count_where, *args) for key, args in counts.items()}
+            stats = {key: future.result() for key, future in futures.items()}
+        return {
+            **stats,
+            "recent": safe_query_raw("items", select="status,created_at,original_url", limit=10,
+                                     order=("created_at", "desc")),
+        }
+
+# Cached reads: Streamlit reruns the script on every interaction, so lists are
+# cached briefly and cleared explicitly by the CRUD helpers below. They raise on
+# DB errors (use `load_cached`) so a transient failure is never cached.
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_sources():
+    return pd.DataFrame(run_query("sources", order=("name", "asc")))
+
+@st.cache_data(ttl=5, show_spinner=False)
+def cached_items(filters=None, in_filters=None, page=1):
+    start = (page - 1) * QUEUE_PAGE_SIZE
+    df = pd.DataFrame(run_query("items", select=QUEUE_COLUMNS, order=("created_at", "desc"),
+                                filters=filters, in_filters=in_filters, range_=(start, start + QUEUE_PAGE_SIZE - 1)))
+    if not df.empty:
+        # Resolve source names from the cached sources list instead of a PostgREST embed
+        sources = cached_sources()
+        src_map = dict(zip(sources['id'], sources['name'])) if not sources.empty else {}
+        df['source_name'] = df['source_id'].map(src_map).fillna('Deleted Source')
+        parse_timestamps(df, ("created_at", "source_published_at"))
+        # Few distinct values: store as int codes, so masks/isin don't walk Python strings
+        for col in ('status', 'source_name'):
+            df[col] = df[col].astype('category')
+    return df
+
+@st.cache_data(ttl=5, show_spinner=False)
+def count_items(filters=None, in_filters=None):
+    return count_where("items", filters, in_filters)
+
+def invalidate_items():
+    cached_items.clear()
+    count_items.clear()
 
 # CRUD: Sources
+
+# Single-pass name -> slug mapping (spaces and Polish diacritics)
+SLUG_TABLE = str.maketrans({
+    " ": "-", "ą": "a", "ę": "e", "ś": "s", "ć": "c", "ż": "z", "ź": "z", "ł": "l", "ó": "o", "ń": "n"
+})
+
 def add_source(name, rss, wp_endpoint, wp_user, wp_pass, categories=None):
     # Auto-generate slug from name to satisfy DB constraint
-    city_slug = name.lower().replace(" ", "-").replace("ą", "a").replace("ę", "e").replace("ś", "s").replace("ć", "c").replace("ż", "z").replace("ź", "z").replace("ł", "l").replace("ó", "o").replace("ń", "n")
+    city_slug = name.lower().translate(SLUG_TABLE)
     
     data = {
         "name": name,
@@ -118,32 +223,57 @@ def add_source(name, rss, wp_endpoint, wp_user, wp_pass, categories=None):
         data["target_categories"] = categories
 
     supabase.table("sources").insert(data).execute()
+    cached_sources.clear()
 
-def delete_source(source_id):
-    supabase.table("sources").delete().eq("id", source_id).execute()
+def delete_sources(source_ids):
+    # Single DELETE ... WHERE id IN (...) for any number of sources
+    supabase.table("sources").delete().in_("id", source_ids).execute()
+    cached_sources.clear()
+    invalidate_items() # items are removed by ON DELETE CASCADE
 
-def update_source_active(source_id, is_active):
-    supabase.table("sources").update({"is_active": is_active}).eq("id", source_id).execute()
+def update_sources_active(activate_ids=(), deactivate_ids=()):
+    # At most one UPDATE ... WHERE id IN (...) per target value
+    for is_active, ids in ((True, activate_ids), (False, deactivate_ids)):
+        if ids:
+            supabase.table("sources").update({"is_active": is_active}).in_("id", list(ids)).execute()
+    cached_sources.clear()
 
 def update_source_fields(source_id, data_dict):
     supabase.table("sources").update(data_dict).eq("id", source_id).execute()
+    cached_sources.clear()
 
 
 # CRUD: Items
+RETRY_RESET = {"status": "PENDING", "error_message": None, "retry_count": 0}
+
+def retry_items(item_ids):
+    # Single UPDATE ... WHERE id IN (...) for any number of items
+    supabase.table("items").update(RETRY_RESET).in_("id", item_ids).execute()
+    invalidate_items()
+
+def retry_all_failed():
+    # Single UPDATE ... WHERE status IN (FAILED_*), no id list to ship
+    supabase.table("items").update(RETRY_RESET).in_("status", FAILED_STATUSES).execute()
+    invalidate_items()
+
 def retry_item(item_id):
-    supabase.table("items").update({
-        "status": "PENDING",
-        "error_message": None,
-        "retry_count": 0 
-    }).eq("id", item_id).execute()
+    retry_items([item_id])
+
+def delete_items(item_ids):
+    supabase.table("items").delete().in_("id", item_ids).execute()
+    invalidate_items()
 
 def delete_item(item_id):
-    supabase.table("items").delete().eq("id", item_id).execute()
+    delete_items([item_id])
+
+def get_item(item_id):
+    """Fetch the full row of a single item."""
+    return supabase.table("items").select("*").eq("id", item_id).single().execute().data
 
-def add_item(source_id, url, title=None, pub_date=None):
+def build_item(source_id, url, title=None, pub_date=None):
     # Calculate dummy hashes for initial insert (real ones happen in Dify)
     url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
-    data = {
+    return {
         "source_id": source_id,
         "original_url": url,
         "url_hash": url_hash,
@@ -151,11 +281,108 @@ def add_item(source_id, url, title=None, pub_date=None):
         "title_original": title if title else "Manual Add",
         "source_published_at": pub_date
     }
-    supabase.table("items").insert(data).execute()
+
+def add_items(rows):
+    """Insert many item rows in batches; URLs already queued are skipped.
+
+    Returns the number of rows actually inserted.
+    """
+    inserted = 0
+    rows = iter(rows)
+    # Chunk to stay under PostgREST payload limits
+    while batch := list(islice(rows, ITEM_INSERT_BATCH)):
+        res = supabase.table("items").upsert(batch, on_conflict="url_hash", ignore_duplicates=True).execute()
+        inserted += len(res.data or [])
+    invalidate_items()
+    return inserted
+
+# --- RSS Import ---
+def feed_to_rows(source_id, rss_url, max_entries=10):
+    """Parses a feed into item rows for its latest entries.
+
+    Returns None if the feed is empty/invalid.
+    """
+    import feedparser # Deferred: only needed when fetching feeds
+    feed = feedparser.parse(rss_url)
+    if not feed.entries:
+        return None
+
+    rows = []
+    for entry in feed.entries[:max_entries]: # Limit to latest entries
+        # Try to get published date
+        pub_date = None
+        if hasattr(entry, 'published'):
+            pub_date = entry.published
+        elif hasattr(entry, 'updated'):
+            pub_date = entry.updated
+
+        rows.append(build_item(source_id, entry.link, title=entry.get('title'), pub_date=pub_date))
+    return rows
+
+def fetch_rss_items(sources, max_entries=10):
+    """Queues the latest entries not seen before for each (source_id, rss_url) pair.
+
+    Feeds are downloaded in parallel (I/O bound) and all rows go out in one
+    batched insert. Returns (number of new items, {source_id: problem}).
+    """
+    def parse(source):
+        source_id, rss_url = source
+        try:
+            rows = feed_to_rows(source_id, rss_url, max_entries)
+            return source_id, rows, None if rows is not None else "RSS Feed parsed but empty or invalid format."
+        except Exception as e:
+            return source_id, None, f"RSS Error: {e}"
+
+    with ThreadPoolExecutor(max_workers=RSS_FETCH_WORKERS) as executor:
+        results = list(executor.map(parse, sources))
+
+    # Rows keyed by url_hash: each link is hashed once (in build_item) and a link
+    # repeated within/across feeds is only sent once
+    rows, problems = {}, {}
+    for source_id, feed_rows, problem in results:
+        if problem:
+            problems[source_id] = problem
+        else:
+            for row in feed_rows:
+                rows.setdefault(row["url_hash"], row)
+
+    # One batched insert; entries already queued (same url_hash) are skipped server-side
+    return (add_items(rows.values()) if rows else 0), problems
 
 # --- Dify Integration ---
-def trigger_dify_workflow(item_id, supabase_url, supabase_key):
-    """Triggers the Dify workflow for a specific item."""
+# (connect, read) seconds; streaming responses only need to start, not finish
+DIFY_TIMEOUT = (5, 30) # (connect, read) seconds; a streamed run only has to emit its first event
+DIFY_BLOCKING_TIMEOUT = (5, 300) # a blocking call holds the request for the whole run
+
+@st.cache_resource
+def get_dify_session():
+    """Shared HTTP session for Dify calls.
+
+    Connections only go back to the pool once a response body is fully read
+    (error responses, blocking runs); a streamed run is closed after its first
+    event, so that connection is dropped rather than reused.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    # Retry covers connection failures; POSTs are never replayed once sent (not idempotent)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def trigger_dify_workflow(item_id, supabase_url, supabase_key, expected_status="PENDING", blocking=False):
+    """Triggers the Dify workflow for a specific item.
+
+    The workflow itself claims the item (PATCH ... WHERE status = expected_status
+    -> PROCESSING) as its first step, so no status update is done here.
+
+    By default the run is streamed and we return once Dify reports
+    `workflow_started`; the run continues server-side. With `blocking=True` the
+    call waits for the run to finish, which keeps bulk triggers one at a time.
+    """
     try:
         api_key = st.secrets["dify"]["API_IMPORT_AND_REWRITE_RSS"]
         base_url = st.secrets["dify"]["BASE_URL"]
@@ -174,21 +401,40 @@ def trigger_dify_workflow(item_id, supabase_url, supabase_key):
         "inputs": {
             "item_id": item_id,
             "supabase_url": supabase_url,
-            "supabase_key": supabase_key
+            "supabase_key": supabase_key,
+            "expected_status": expected_status
         },
-        "response_mode": "blocking",
+        "response_mode": "blocking" if blocking else "streaming",
         "user": "streamlit-admin"
     }
     
     try:
-        import requests
-        resp = requests.post(url, json=payload, headers=headers)
-        
-        if resp.status_code == 200:
+        timeout = DIFY_BLOCKING_TIMEOUT if blocking else DIFY_TIMEOUT
+        with get_dify_session().post(url, json=payload, headers=headers, timeout=timeout, stream=not blocking) as resp:
+            if resp.status_code != 200:
+                st.error(f"Dify Error {resp.status_code}: {resp.text}")
+                return False
+
+            if blocking:
+                run = resp.json().get("data", {})
+                if run.get("status") == "failed":
+                    st.error(f"Dify run failed for {item_id}: {run.get('error')}")
+                    return False
+            else:
+                # Read up to the first real event (skipping pings) so a run that
+                # errors out immediately is reported instead of counted as started
+                event = {}
+                for line in resp.iter_lines(decode_unicode=True):
+                    if line and line.startswith("data:"):
+                        event = json.loads(line[len("data:"):])
+                        if event.get("event") in ("workflow_started", "error"):
+                            break
+                if event.get("event") != "workflow_started":
+                    st.error(f"Dify Error: {event.get('message', 'run did not start')}")
+                    return False
+
+            invalidate_items()
             return True
-        else:
-            st.error(f"Dify Error {resp.status_code}: {resp.text}")
-            return False
     except Exception as e:
         st.error(f"Request failed: {e}")
         return False
@@ -202,46 +448,45 @@ def sidebar_menu():
     menu = st.sidebar.radio("Navigation", ["Dashboard", "Content Queue", "Source & Destination Manager"])
     st.sidebar.markdown("---")
     st.sidebar.info("System Status: Online 🟢")
+    if st.sidebar.button("🔄 Reload Connection", help="Rebuild the Supabase/Dify clients (e.g. after updating secrets) and drop cached data"):
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        st.rerun()
     return menu
 
 # --- Page: Dashboard ---
 def show_dashboard():
     st.title("System Dashboard 📊")
     
-    # Check connection by simple count
-    items_count = 0
+    # All KPI counts come from a single RPC (see `dashboard_stats` in supabase_schema.sql)
     try:
-        count_res = supabase.table("items").select("id", count="exact").execute()
-        items_count = count_res.count
-    except Exception:
-        pass # specific error handled in safe_query calls later
-    
-    col1, col2, col3, col4 = st.columns(4)
-    
-    # We use python len() on dataframes from safe_query for safety if count fails
-    df_items = safe_query("items", select="status")
-    df_sources = safe_query("sources", select="is_active")
-
-    if not df_items.empty:
-        total_pub = len(df_items[df_items['status'] == 'PUBLISHED'])
-        total_fail = len(df_items[df_items['status'].str.contains('FAILED', na=False)])
-        queue_size = len(df_items[df_items['status'] == 'PENDING'])
-    else:
-        total_pub = 0; total_fail = 0; queue_size = 0
-        
-    active_src = len(df_sources[df_sources['is_active'] == True]) if not df_sources.empty else 0
-
-    col1.metric("Published Articles", total_pub)
-    col2.metric("Failed Items", total_fail, delta_color="inverse")
-    col3.metric("Pending Queue", queue_size)
-    col4.metric("Active Sources", active_src)
+        stats = get_dashboard_stats()
+    except Exception as e:
+        st.error(f"Could not load dashboard stats: {e}")
+        st.warning("Please ensure you have run the latest `supabase_schema.sql` in Supabase SQL Editor.")
+        stats = {}
+
+    # One markdown element for the whole KPI row instead of columns + 4 metric widgets
+    kpis = [
+        ("Published Articles", stats.get("pub", 0), None),
+        ("Failed Items", stats.get("fail", 0), "#ff4b4b" if stats.get("fail") else None),
+        ("Pending Queue", stats.get("pending", 0), None),
+        ("Active Sources", stats.get("active", 0), None),
+    ]
+    cells = "".join(
+        f'<div style="flex:1"><div style="font-size:0.875rem;opacity:0.7">{label}</div>'
+        f'<div style="font-size:2.25rem;{f"color:{color}" if color else ""}">{value}</div></div>'
+        for label, value, color in kpis
+    )
+    st.markdown(f'<div style="display:flex;gap:1rem">{cells}</div>', unsafe_allow_html=True)
     
     st.divider()
     
     # Recents
     st.subheader("Latest Activity")
-    recent_items = safe_query("items", limit=10, order=("created_at", "desc"))
+    recent_items = pd.DataFrame(stats.get("recent") or [])
     if not recent_items.empty:
+        parse_timestamps(recent_items)
         st.dataframe(
             recent_items[['status', 'created_at', 'original_url']], 
             use_container_width=True,
@@ -257,165 +502,209 @@ def show_queue():
     tab_list, tab_add = st.tabs(["Browse Operations", "Add Manually"])
     
     with tab_list:
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3 = st.columns([3, 1, 1])
         with col1:
             status_opts = ['PENDING', 'PROCESSING', 'PUBLISHED', 'FAILED', 'ERROR']
             # Simplify filters
             selected_status_broad = st.selectbox("Status Filter", ["ALL"] + status_opts, index=0)
-            
+
+        # Status filter is applied server-side so each page holds matching rows only
+        filters, in_filters = None, None
+        if selected_status_broad == "FAILED":
+            # Handle extended fail statuses
+            in_filters = {"status": FAILED_STATUSES}
+        elif selected_status_broad != "ALL":
+            filters = {"status": selected_status_broad}
+
+        try:
+            total_items = count_items(filters=filters, in_filters=in_filters)
+        except Exception:
+            total_items = None # error surfaced by the list query below
+        total_pages = max(1, math.ceil(total_items / QUEUE_PAGE_SIZE)) if total_items else 1
+
         with col2:
+            # Keyed per filter so the page resets when the filter changes
+            page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1,
+                                   key=f"queue_page_{selected_status_broad}")
+            
+        with col3:
             st.write("") 
             if st.button("🔄 Refresh", use_container_width=True):
+                invalidate_items()
                 st.rerun()
 
-        # Fetch
-        df = safe_query("items", select="*, sources(name)", limit=100, order=("created_at", "desc"))
+        # Fetch only the visible page; skip the list request when the count probe found nothing
+        if total_items != 0:
+            df = load_cached(cached_items, "items", filters=filters, in_filters=in_filters, page=page)
+        else:
+            df = pd.DataFrame()
         
-        if not df.empty:
-            # Flatten source name
-            df['source_name'] = df['sources'].apply(lambda x: x['name'] if isinstance(x, dict) else (x if x else 'Deleted Source'))
+        if df is None:
+            pass # error already reported
+        elif not df.empty:
+            # Display
+            # Row selection is handled by the grid itself (frontend), no per-option Python work
+            cols_to_show = ['source_name', 'status', 'created_at', 'title_original', 'source_published_at', 'original_url']
             
-            # Local Filter
-            if selected_status_broad != "ALL":
-                # Handle extended fail statuses
-                if selected_status_broad == "FAILED":
-                    df = df[df['status'].str.contains('FAILED', na=False)]
-                else:
-                    df = df[df['status'] == selected_status_broad]
+            event = st.dataframe(
+                df[cols_to_show],
+                column_config={
+                    "original_url": st.column_config.LinkColumn("Link"),
+                    "title_original": "Article Title",
+                    "source_name": "Source",
+                    "status": "Status",
+                    "source_published_at": "Pub Date (RSS)",
+                },
+                use_container_width=True,
+                hide_index=True,
+                on_select="rerun",
+                selection_mode="multi-row",
+                # Keyed per filter/page so a selection never points at rows of another page
+                key=f"queue_grid_{selected_status_broad}_{page}"
+            )
+            if total_items is not None:
+                st.caption(f"Page {page} of {total_pages} ({total_items} items)")
             
-            # Display
-            if not df.empty:
-                # Bulk Selection UX
-                # Prepare dataframe for editor
-                # Add a 'Selected' column
-                df['Select'] = False
-                
-                # Cols to show
-                cols_to_show = ['Select', 'source_name', 'status', 'created_at', 'title_original', 'source_published_at', 'original_url']
-                
-                edited_df = st.data_editor(
-                    df[cols_to_show],
-                    column_config={
-                        "original_url": st.column_config.LinkColumn("Link"),
-                        "title_original": "Article Title",
-                        "source_name": "Source",
-                        "status": "Status",
-                        "source_published_at": "Pub Date (RSS)",
-                        "Select": st.column_config.CheckboxColumn("Select", help="Select to run workflow"),
-                    },
-                    use_container_width=True,
-                    hide_index=True,
-                    disabled=['source_name', 'status', 'created_at', 'title_original', 'source_published_at', 'original_url'] # Only Select is editable
-                )
-                
-                # Bulk Action Button
-                selected_rows = edited_df[edited_df['Select'] == True]
+            # Selection holds positional rows; df has a default RangeIndex so positions == labels
+            selected_rows = df.iloc[event.selection.rows]
+            
+            st.divider()
+            st.subheader("Bulk Actions")
+            
+            if selected_status_broad == "FAILED":
+                if st.button(f"♻️ Retry All FAILED ({total_items if total_items is not None else len(df)})"):
+                    try:
+                        retry_all_failed()
+                        st.success("Requeued!")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Failed: {e}")
+            
+            if not selected_rows.empty:
+                st.write(f"Selected {len(selected_rows)} items.")
+                selected_ids = selected_rows['id'].tolist()
+                b1, b2, b3 = st.columns(3)
+                with b2:
+                    if st.button("♻️ Retry Selected", use_container_width=True):
+                        try:
+                            retry_items(selected_ids)
+                            st.success("Requeued!")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Failed: {e}")
+                with b3:
+                    if st.button("🗑️ Delete Selected", use_container_width=True):
+                        try:
+                            delete_items(selected_ids)
+                            st.success("Deleted!")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Failed: {e}")
+                if b1.button("🚀 Run Workflow for Selected", use_container_width=True):
+                    progress_bar = st.progress(0)
+                    success_count = 0
+                    
+                    total = len(selected_rows)
+                    # One vectorized membership test instead of a substring check per row
+                    runnable = selected_rows['status'].isin(RUNNABLE_STATUSES)
+                    for i, row in enumerate(selected_rows.itertuples()):
+                        if runnable[row.Index]:
+                            try:
+                                sb_url = st.secrets["SUPABASE"]["URL"]
+                                sb_key = st.secrets["SUPABASE"]["KEY"]
+                                # Blocking: each run finishes before the next starts, so N selected
+                                # rows never put N concurrent runs on Dify/WordPress
+                                if trigger_dify_workflow(row.id, sb_url, sb_key, expected_status=row.status, blocking=True):
+                                    success_count += 1
+                            except Exception as e:
+                                st.error(f"Failed to trigger {row.title_original}: {e}")
+                        
+                        progress_bar.progress((i + 1) / total)
+                    
+                    st.success(f"Triggered {success_count} workflows!")
+                    time.sleep(2)
+                    st.rerun()
+            else:
+                st.info("Select rows above to perform bulk actions.")
+
+            st.divider()
+            st.subheader("Single Item Console")
+            
+            sel_id = selected_rows['id'].iloc[0] if len(selected_rows) == 1 else None
+            
+            if not sel_id:
+                st.info("Select a single row above to open it here.")
+            else:
+                row = selected_rows.iloc[0]
+                c1, c2, c3 = st.columns(3)
                 
-                st.divider()
-                st.subheader("Bulk Actions")
+                with c1:
+                    st.info(f"**Status:** {row['status']}")
+                    if st.button("♻️ Retry Item", type="primary"):
+                        try:
+                            retry_item(sel_id)
+                            st.success("Requeued!")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Failed: {e}")
                 
-                if not selected_rows.empty:
-                    st.write(f"Selected {len(selected_rows)} items.")
-                    if st.button("🚀 Run Workflow for Selected"):
-                        progress_bar = st.progress(0)
-                        success_count = 0
-                        
-                        total = len(selected_rows)
-                        for i, (index, row) in enumerate(selected_rows.iterrows()):
-                            # Get real ID from original df (index should match if we didn't reset it, but safe to lookup)
-                            # Actually safe_query returns new index. 
-                            # We can merge back or just trust the index if we didn't sort differently. 
-                            # Better: Join with original DF on some unique key if index is shaky, but here data_editor preserves index.
-                            # Wait, data_editor returns same index.
-                            real_id = df.loc[index, 'id'] 
-                            status = df.loc[index, 'status']
+                with c2:
+                    if st.button("🗑️ Delete Item", type="secondary"):
+                        try:
+                            delete_item(sel_id)
+                            st.success("Deleted!")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Failed: {e}")
                             
-                            if status == 'PENDING' or 'FAILED' in status:
+                with c3:
+                    st.markdown(f"[Open Link]({row['original_url']})")
+                    
+                    # Trigger Button
+                    if row['status'] == 'PENDING':
+                        if st.button("🚀 Run Workflow", type="primary"):
+                            with st.spinner("Triggering Dify..."):
+                                # Get explicit keys to pass to Dify (so it doesn't need its own env vars)
                                 try:
                                     sb_url = st.secrets["SUPABASE"]["URL"]
                                     sb_key = st.secrets["SUPABASE"]["KEY"]
-                                    if trigger_dify_workflow(real_id, sb_url, sb_key):
-                                        supabase.table("items").update({"status": "PROCESSING"}).eq("id", real_id).execute()
-                                        success_count += 1
+                                    if trigger_dify_workflow(sel_id, sb_url, sb_key):
+                                        st.success("Workflow started!")
+                                        st.rerun()
                                 except Exception as e:
-                                    st.error(f"Failed to trigger {row['title_original']}: {e}")
-                            
-                            progress_bar.progress((i + 1) / total)
-                        
-                        st.success(f"Triggered {success_count} workflows!")
-                        time.sleep(2)
-                        st.rerun()
-                else:
-                    st.info("Select items above to perform bulk actions.")
+                                    st.error(f"Trigger failed: {e}")
 
-                st.divider()
-                st.subheader("Single Item Console")
-                
-                sel_id = st.selectbox("Select Item Context:", df['id'].tolist(), format_func=lambda x: f"{df[df['id']==x]['title_original'].values[0][:30]}... ({df[df['id']==x]['status'].values[0]})")
-                
-                if sel_id:
-                    row = df[df['id'] == sel_id].iloc[0]
-                    c1, c2, c3 = st.columns(3)
-                    
-                    with c1:
-                        st.info(f"**Status:** {row['status']}")
-                        if st.button("♻️ Retry Item", type="primary"):
-                            try:
-                                retry_item(sel_id)
-                                st.success("Requeued!")
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Failed: {e}")
-                    
-                    with c2:
-                        if st.button("🗑️ Delete Item", type="secondary"):
-                            try:
-                                delete_item(sel_id)
-                                st.success("Deleted!")
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Failed: {e}")
-                                
-                    with c3:
-                        st.markdown(f"[Open Link]({row['original_url']})")
-                        
-                        # Trigger Button
-                        if row['status'] == 'PENDING':
-                            if st.button("🚀 Run Workflow", type="primary"):
-                                with st.spinner("Triggering Dify..."):
-                                    # Get explicit keys to pass to Dify (so it doesn't need its own env vars)
-                                    try:
-                                        sb_url = st.secrets["SUPABASE"]["URL"]
-                                        sb_key = st.secrets["SUPABASE"]["KEY"]
-                                        if trigger_dify_workflow(sel_id, sb_url, sb_key):
-                                            st.success("Workflow started!")
-                                            supabase.table("items").update({"status": "PROCESSING"}).eq("id", sel_id).execute()
-                                            st.rerun()
-                                    except Exception as e:
-                                        st.error(f"Trigger failed: {e}")
-
-                    with st.expander("Full Details JSON"):
-                        # Convert row to dict, handle non-serializable?
-                        st.json(row.to_dict())
+                # Expander bodies run even when collapsed, so gate the fetch on an explicit toggle
+                if st.toggle("Show Full Details JSON", key=f"details_{sel_id}"):
+                    # Grid only holds QUEUE_COLUMNS, so load the full row here
+                    try:
+                        st.json(get_item(sel_id))
+                    except Exception as e:
+                        st.error(f"Failed to load item: {e}")
 
-            else:
-                st.info("No items match this filter.")
+        elif selected_status_broad != "ALL":
+            st.info("No items match this filter.")
         else:
             st.info("Queue is empty.")
 
     with tab_add:
         st.subheader("Manual Injection")
-        sources = safe_query("sources", select="id, name")
-        if not sources.empty:
+        sources = load_cached(cached_sources, "sources")
+        if sources is None:
+            pass # error already reported
+        elif not sources.empty:
             with st.form("manual_add"):
-                s_id = st.selectbox("Target Source", sources['id'], format_func=lambda x: sources[sources['id']==x]['name'].values[0])
-                url_in = st.text_input("Article URL")
+                id_to_name = dict(zip(sources['id'], sources['name']))
+                s_id = st.selectbox("Target Source", sources['id'], format_func=lambda x: id_to_name[x])
+                urls_in = st.text_area("Article URLs (one per line)")
                 
                 if st.form_submit_button("Inject to Queue"):
-                    if url_in:
+                    # Strip and de-duplicate while keeping paste order
+                    urls = list(dict.fromkeys(u.strip() for u in urls_in.splitlines() if u.strip()))
+                    if urls:
                         try:
-                            add_item(s_id, url_in)
-                            st.success("Added to queue!")
+                            added = add_items(build_item(s_id, u) for u in urls)
+                            st.success(f"Added {added} of {len(urls)} URLs to queue!")
                         except Exception as e:
                             st.error(f"Add failed: {e}")
                     else:
@@ -425,6 +714,24 @@ def show_queue():
 
 
 # --- Page: Source Manager ---
+def run_rss_fetch(sources_df):
+    """Fetches RSS for the given sources rows and reports the outcome."""
+    with st.spinner("Parsing RSS Feeds..."):
+        try:
+            count_new, problems = fetch_rss_items(list(zip(sources_df['id'], sources_df['rss_url'])))
+        except Exception as e:
+            st.error(f"RSS Error: {e}")
+            return
+    id_to_name = dict(zip(sources_df['id'], sources_df['name']))
+    for source_id, problem in problems.items():
+        st.warning(f"{id_to_name[source_id]}: {problem}")
+    if count_new > 0:
+        st.success(f"Added {count_new} new items to Queue!")
+        time.sleep(1) # Visual pause
+        st.rerun()
+    else:
+        st.info("No new items found.")
+
 def show_sources():
     st.title("Source & Destination Manager 🌐")
     
@@ -433,67 +740,83 @@ def show_sources():
     tab_view, tab_add, tab_mass = st.tabs(["Active Sources", "Add New Source", "Mass Import (XLSX)"])
     
     with tab_view:
-        df = safe_query("sources", order=("name", "asc"))
+        df = load_cached(cached_sources, "sources")
         
-        if not df.empty:
-            for idx, row in df.iterrows():
-                with st.expander(f"{row['name']} {'🟢' if row['is_active'] else '🔴'}"):
-                    c1, c2 = st.columns(2)
-                    with c1:
-                        st.text_input("Endpoint", value=row['wp_api_endpoint'], disabled=True, key=f"ep_{row['id']}")
-                        st.text_input("RSS", value=row['rss_url'], disabled=True, key=f"rss_{row['id']}")
-                        # Show categories if present
-                        cats = row.get('target_categories')
-                        st.text_input("Target Categories", value=cats if cats else "N/A", disabled=True, key=f"cat_{row['id']}")
-                        
-                        if st.button("📡 Fetch Articles from RSS", key=f"fetch_{row['id']}"):
-                            with st.spinner("Parsing RSS Feed..."):
-                                try:
-                                    feed = feedparser.parse(row['rss_url'])
-                                    if feed.entries:
-                                        count_new = 0
-                                        for entry in feed.entries[:10]: # Limit to 10 latest
-                                             link = entry.link
-                                             # Check dup
-                                             h = hashlib.sha256(link.encode('utf-8')).hexdigest()
-                                             res = supabase.table("items").select("id", count="exact").eq("url_hash", h).execute()
-                                             if res.count == 0:
-                                                 # Try to get published date
-                                                 pub_date = None
-                                                 if hasattr(entry, 'published'):
-                                                     pub_date = entry.published
-                                                 elif hasattr(entry, 'updated'):
-                                                     pub_date = entry.updated
-                                                     
-                                                 add_item(row['id'], link, title=entry.title, pub_date=pub_date)
-                                                 count_new += 1
-                                        if count_new > 0:
-                                            st.success(f"Added {count_new} new items to Queue!")
-                                            time.sleep(1) # Visual pause
-                                            st.rerun()
-                                        else:
-                                            st.info("No new items found.")
-                                    else:
-                                        st.warning("RSS Feed parsed but empty or invalid format.")
-                                except Exception as e:
-                                    st.error(f"RSS Error: {e}")
-                    
-                    with c2:
-                        st.write("Actions")
-                        # Activation Toggle
-                        current_state = row['is_active']
-                        if st.button(f"{'Deactivate' if current_state else 'Activate'}", key=f"btn_act_{row['id']}"):
-                            update_source_active(row['id'], not current_state)
+        if df is None:
+            pass # error already reported
+        elif not df.empty:
+            active_df = df[df['is_active'] == True]
+            if st.button(f"📡 Fetch All Active ({len(active_df)})", disabled=active_df.empty):
+                run_rss_fetch(active_df)
+            
+            # Single editable grid instead of per-source expanders/widgets
+            df['Select'] = False
+            cols_to_show = ['Select', 'name', 'is_active', 'rss_url', 'wp_api_endpoint', 'target_categories']
+            
+            edited_df = st.data_editor(
+                df[cols_to_show],
+                column_config={
+                    "name": "Name",
+                    "is_active": st.column_config.CheckboxColumn("Active", help="Toggle to activate/deactivate"),
+                    "rss_url": st.column_config.LinkColumn("RSS"),
+                    "wp_api_endpoint": "Endpoint",
+                    "target_categories": "Target Categories",
+                    "Select": st.column_config.CheckboxColumn("Select", help="Select for bulk actions"),
+                },
+                use_container_width=True,
+                hide_index=True,
+                disabled=['name', 'rss_url', 'wp_api_endpoint', 'target_categories'] # Select & Active are editable
+            )
+            
+            # Persist only the activation flags that were actually toggled (data_editor preserves index)
+            changed = edited_df[edited_df['is_active'] != df['is_active']]
+            if not changed.empty:
+                try:
+                    ids = df.loc[changed.index, 'id']
+                    activate = changed['is_active'].astype(bool)
+                    update_sources_active(activate_ids=ids[activate].tolist(), deactivate_ids=ids[~activate].tolist())
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error: {e}")
+            
+            selected_rows = edited_df[edited_df['Select'] == True]
+            
+            if not selected_rows.empty:
+                st.write(f"Selected {len(selected_rows)} sources.")
+                c1, c2 = st.columns(2)
+                with c1:
+                    if st.button("📡 Fetch Articles from RSS"):
+                        run_rss_fetch(df.loc[selected_rows.index])
+                with c2:
+                    if st.button("Delete Selected", type="primary"):
+                        try:
+                            delete_sources(df.loc[selected_rows.index, 'id'].tolist())
+                            st.success("Deleted.")
                             st.rerun()
-                            
-                        # Delete
-                        if st.button("Delete Source", key=f"del_{row['id']}", type="primary"):
-                             try:
-                                 delete_source(row['id'])
-                                 st.success("Deleted.")
-                                 st.rerun()
-                             except Exception as e:
-                                 st.error(f"Error: {e}")
+                        except Exception as e:
+                            st.error(f"Error: {e}")
+            else:
+                st.info("Select sources above to fetch articles or delete them.")
+            
+            # Single edit panel for one selected source (widget count independent of source count)
+            if len(selected_rows) == 1:
+                row = df.loc[selected_rows.index[0]]
+                with st.form(f"edit_source_{row['id']}"):
+                    st.subheader(f"Edit {row['name']}")
+                    e_rss = st.text_input("RSS Feed URL", value=row['rss_url'])
+                    e_endpoint = st.text_input("WP API Endpoint", value=row['wp_api_endpoint'])
+                    e_cats = st.text_input("Target Categories (comma separated)", value=row.get('target_categories') or "")
+                    if st.form_submit_button("Save Changes"):
+                        try:
+                            update_source_fields(row['id'], {
+                                "rss_url": e_rss,
+                                "wp_api_endpoint": e_endpoint,
+                                "target_categories": e_cats or None
+                            })
+                            st.success("Saved.")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"Error: {e}")
             
             st.caption(f"Total Sources: {len(df)}")
             
@@ -577,28 +900,28 @@ def show_sources():
                     progress_bar = st.progress(0)
                     total = len(edited_df)
                     
-                    for i, row in edited_df.iterrows():
+                    for i, row in enumerate(edited_df.itertuples()):
                         try:
                             # Basic validation
-                            if pd.isna(row['name']) or pd.isna(row['rss_url']):
+                            if pd.isna(row.name) or pd.isna(row.rss_url):
                                 continue
                                 
-                            clean_domain = str(row['wp_domain']).replace("https://", "").replace("http://", "").strip("/")
+                            clean_domain = str(row.wp_domain).replace("https://", "").replace("http://", "").strip("/")
                             n_endpoint = f"https://{clean_domain}/wp-json/wp/v2"
                             
-                            cats = str(row['target_categories']) if not pd.isna(row['target_categories']) else None
+                            cats = str(row.target_categories) if not pd.isna(row.target_categories) else None
                             
                             add_source(
-                                name=str(row['name']), 
-                                rss=str(row['rss_url']), 
+                                name=str(row.name), 
+                                rss=str(row.rss_url), 
                                 wp_endpoint=n_endpoint, 
-                                wp_user=str(row['wp_user']), 
-                                wp_pass=str(row['wp_password']),
+                                wp_user=str(row.wp_user), 
+                                wp_pass=str(row.wp_password),
                                 categories=cats
                             )
                             success_count += 1
                         except Exception as e:
-                            st.error(f"Failed to import row {i}: {e}")
+                            st.error(f"Failed to import row {row.Index}: {e}")
                             fail_count += 1
                         
                         progress_bar.progress((i + 1) / total)
@@ -96,3 +96,21 @@ ALTER TABLE public.items ENABLE ROW LEVEL SECURITY;
 -- ideally restrict to authenticated service_role only.
 CREATE POLICY "Enable access to all users" ON public.sources FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Enable access to all users" ON public.items FOR ALL USING (true) WITH CHECK (true);
+
+-- 6. RPC: dashboard_stats
+-- Returns all dashboard KPI counts and the latest activity in a single round-trip
+CREATE OR REPLACE FUNCTION public.dashboard_stats()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'pub',     (SELECT count(*) FROM public.items WHERE status = 'PUBLISHED'),
+        'fail',    (SELECT count(*) FROM public.items WHERE status::text LIKE 'FAILED%'),
+        'pending', (SELECT count(*) FROM public.items WHERE status = 'PENDING'),
+        'active',  (SELECT count(*) FROM public.sources WHERE is_active),
+        'recent',  (SELECT coalesce(json_agg(r ORDER BY r.created_at DESC), '[]'::json) FROM (
+                        SELECT status, created_at, original_url
+                        FROM public.items
+                        ORDER BY created_at DESC
+                        LIMIT 10
+                    ) r)
+    );
+$$ LANGUAGE sql STABLE;